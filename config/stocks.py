@@ -3,7 +3,7 @@
 # Nifty 500 stock symbols (with .NS suffix for yfinance)
 # Complete list of Nifty 500 constituents fetched from NSE
 
-NIFTY_500_STOCKS = [
+NIFTY_500_STOCKS = (
     "MRPL.NS",
     "GRAPHITE.NS",
     "CRAFTSMAN.NS",
@@ -503,7 +503,10 @@ NIFTY_500_STOCKS = [
     "ASAHIINDIA.NS",
     "NAVINFLUOR.NS",
     "IDEA.NS"
-]
+)
+
+# Set view of NIFTY_500_STOCKS for membership checks
+NIFTY_500_SET = frozenset(NIFTY_500_STOCKS)
 
 # Configuration
 LOOKBACK_DAYS = 30  # Number of days to look back for trend detection
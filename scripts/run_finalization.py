@@ -1,59 +1,62 @@
 #!/usr/bin/env python3
 """
 Executable script for finalization job.
-Invoked by cron at 3:15 PM IST on weekdays.
+Invoked by cron at 3:17 PM IST on weekdays.
 """
 
+import logging
+import random
 import sys
 import os
+import time
 from datetime import datetime
-import pytz
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.finalization_job import finalize_stocks
+from src.logging_setup import setup_logging
+from src.trading_calendar import is_trading_day
+from src.tz import IST
 
+# Maximum random delay (seconds) before starting, so runs from many machines
+# do not hit Yahoo Finance at the same moment
+START_JITTER_SECONDS = float(os.getenv("JOB_START_JITTER_SECONDS", "30"))
 
-def is_trading_day() -> bool:
-    """
-    Check if today is a trading day (weekday, not a holiday).
-    For now, we only check if it's a weekday.
-    In production, you would also check against a holiday calendar.
-    """
-    ist = pytz.timezone('Asia/Kolkata')
-    now_ist = datetime.now(ist)
-    
-    # Check if it's a weekday (Monday=0, Sunday=6)
-    is_weekday = now_ist.weekday() < 5
-    
-    return is_weekday
+logger = logging.getLogger("run_finalization")
 
 
 def main():
     """Main entry point for the script."""
-    ist = pytz.timezone('Asia/Kolkata')
-    now_ist = datetime.now(ist)
-    
-    print(f"Finalization Job - Started at {now_ist.strftime('%Y-%m-%d %H:%M:%S IST')}")
-    
-    # Validate it's a trading day
-    if not is_trading_day():
-        print(f"Today is not a trading day. Skipping finalization.")
-        sys.exit(0)
+    listener = setup_logging()
+    now_ist = datetime.now(IST)
     
     try:
-        # Run the finalization job
-        result_df = finalize_stocks()
+        logger.info("Finalization Job - Started at %s", now_ist.strftime('%Y-%m-%d %H:%M:%S IST'))
+        
+        # Validate it's a trading day
+        if not is_trading_day():
+            logger.info("Today is not a trading day. Skipping finalization.")
+            sys.exit(0)
+        
+        time.sleep(random.uniform(0, START_JITTER_SECONDS))
+        
+        try:
+            # Imported only on trading days: pulls in pandas/numpy/yfinance
+            from src.finalization_job import finalize_stocks
+            
+            # Run the finalization job
+            result_df = finalize_stocks()
+            
+            logger.info("Finalization Job - Completed at %s", datetime.now(IST).strftime('%Y-%m-%d %H:%M:%S IST'))
+            sys.exit(0)
         
-        print(f"Finalization Job - Completed at {datetime.now(ist).strftime('%Y-%m-%d %H:%M:%S IST')}")
-        sys.exit(0)
+        except Exception as e:
+            logger.exception("Error in finalization job: %s", e)
+            sys.exit(1)
     
-    except Exception as e:
-        print(f"Error in finalization job: {e}")
-        import traceback
-        traceback.print_exc()
-        sys.exit(1)
+    finally:
+        # Flush queued log records before the process exits
+        listener.stop()
 
 
 if __name__ == "__main__":
@@ -1,9 +1,12 @@
 #!/usr/bin/env python3
 """
-Helper script to verify and test cron setup for swing trading automation.
+Helper script to verify and test cron (or systemd timer) setup for swing
+trading automation.
 """
 
+import importlib.util
 import os
+import shutil
 import sys
 import subprocess
 from pathlib import Path
@@ -89,6 +92,55 @@ def check_cron_jobs():
         return False
 
 
+def systemd_available():
+    """Check if this machine runs systemd (so timers can be used instead of cron)."""
+    return shutil.which('systemctl') is not None and os.path.isdir('/run/systemd/system')
+
+
+def check_systemd_timers():
+    """Check if the systemd user timers are installed."""
+    print_header("Checking systemd Timers")
+    
+    try:
+        result = subprocess.run(['systemctl', '--user', 'list-timers', '--all', '--no-pager'],
+                              capture_output=True,
+                              text=True,
+                              timeout=5)
+        
+        if result.returncode != 0:
+            print_error("Could not list systemd user timers")
+            print(f"  {result.stderr.strip()}")
+            return False
+        
+        timers_content = result.stdout.strip()
+        print(f"Current systemd user timers:\n")
+        print(timers_content)
+        print()
+        
+        # Check for our specific timers
+        has_finalization = 'swing-finalization.timer' in timers_content
+        has_pool_creation = 'swing-pool-creation.timer' in timers_content
+        
+        if has_finalization:
+            print_success("Finalization timer found")
+        else:
+            print_error("Finalization timer NOT found")
+        
+        if has_pool_creation:
+            print_success("Pool creation timer found")
+        else:
+            print_error("Pool creation timer NOT found")
+        
+        return has_finalization and has_pool_creation
+    
+    except subprocess.TimeoutExpired:
+        print_error("Timeout checking systemd timers")
+        return False
+    except Exception as e:
+        print_error(f"Error checking systemd timers: {e}")
+        return False
+
+
 def check_paths():
     """Check if all required paths exist."""
     print_header("Checking Paths")
@@ -125,6 +177,19 @@ def check_scripts_executable():
         'Pool Creation': project_root / 'scripts' / 'run_pool_creation.py',
     }
     
+    # Byte-compile all scripts with a single interpreter run; a script's
+    # syntax is valid if it ends up with an up-to-date __pycache__ entry
+    compile_output = ""
+    try:
+        result = subprocess.run(
+            [sys.executable, '-m', 'compileall', '-q', str(project_root / 'scripts')],
+            capture_output=True,
+            timeout=30
+        )
+        compile_output = result.stdout.decode() + result.stderr.decode()
+    except Exception as e:
+        print_warning(f"Could not compile scripts: {e}")
+    
     all_ok = True
     for name, script_path in scripts.items():
         print(f"\nTesting {name} script...")
@@ -140,22 +205,15 @@ def check_scripts_executable():
             print_warning(f"Script is not executable: {script_path}")
             print(f"  Fix with: chmod +x {script_path}")
         
-        # Try to run with --help or dry-run (if supported)
-        # For now, just check syntax
-        try:
-            result = subprocess.run(
-                [sys.executable, '-m', 'py_compile', str(script_path)],
-                capture_output=True,
-                timeout=5
-            )
-            if result.returncode == 0:
-                print_success(f"{name} script syntax is valid")
-            else:
-                print_error(f"{name} script has syntax errors")
-                print(f"  {result.stderr.decode()}")
-                all_ok = False
-        except Exception as e:
-            print_warning(f"Could not verify {name} script: {e}")
+        # A failed compile leaves no (or only a stale) __pycache__ entry
+        cached_path = Path(importlib.util.cache_from_source(str(script_path)))
+        if cached_path.exists() and cached_path.stat().st_mtime >= script_path.stat().st_mtime:
+            print_success(f"{name} script syntax is valid")
+        else:
+            print_error(f"{name} script has syntax errors")
+            if compile_output:
+                print(f"  {compile_output}")
+            all_ok = False
     
     return all_ok
 
@@ -217,14 +275,33 @@ def show_cron_instructions():
                     print(f"   {line.rstrip()}")
     else:
         print(f"   PROJECT_PATH={project_root}")
-        print(f"   15 15 * * 1-5 cd $PROJECT_PATH && $PROJECT_PATH/.venv/bin/python3 scripts/run_finalization.py >> logs/finalization.log 2>&1")
-        print(f"   30 16 * * 1-5 cd $PROJECT_PATH && $PROJECT_PATH/.venv/bin/python3 scripts/run_pool_creation.py >> logs/pool_creation.log 2>&1")
+        print(f"   17 15 * * 1-5 cd $PROJECT_PATH && $PROJECT_PATH/.venv/bin/python3 scripts/run_finalization.py >> logs/finalization.log 2>&1")
+        print(f"   32 16 * * 1-5 cd $PROJECT_PATH && $PROJECT_PATH/.venv/bin/python3 scripts/run_pool_creation.py >> logs/pool_creation.log 2>&1")
     
     print("\n3. Save and exit the editor")
     print("\n4. Verify with:")
     print(f"   {YELLOW}crontab -l{RESET}")
 
 
+def show_systemd_instructions():
+    """Show instructions for installing the systemd timers."""
+    print_header("How to Install systemd Timers")
+    
+    project_root = Path(__file__).parent.parent
+    
+    print("1. Update /path/to/swing_trading in the unit files:")
+    print(f"   {YELLOW}sed -i 's|/path/to/swing_trading|{project_root}|g' {project_root}/systemd/*{RESET}")
+    print("\n2. Install and enable the timers:")
+    print(f"   {YELLOW}mkdir -p ~/.config/systemd/user{RESET}")
+    print(f"   {YELLOW}cp {project_root}/systemd/swing-* ~/.config/systemd/user/{RESET}")
+    print(f"   {YELLOW}systemctl --user daemon-reload{RESET}")
+    print(f"   {YELLOW}systemctl --user enable --now swing-finalization.timer swing-pool-creation.timer{RESET}")
+    print("\n3. Keep timers running while logged out:")
+    print(f"   {YELLOW}loginctl enable-linger $USER{RESET}")
+    print("\n4. Verify with:")
+    print(f"   {YELLOW}systemctl --user list-timers{RESET}")
+
+
 def test_manual_run():
     """Test if scripts can run manually."""
     print_header("Testing Manual Execution")
@@ -238,18 +315,19 @@ def test_manual_run():
     
     print("Testing scripts with dry-run (checking imports and basic execution)...")
     
+    # The job modules are imported lazily inside main(), so import them explicitly
     scripts = {
-        'Finalization': project_root / 'scripts' / 'run_finalization.py',
-        'Pool Creation': project_root / 'scripts' / 'run_pool_creation.py',
+        'Finalization': (project_root / 'scripts' / 'run_finalization.py', 'src.finalization_job'),
+        'Pool Creation': (project_root / 'scripts' / 'run_pool_creation.py', 'src.pool_creation_job'),
     }
     
     all_ok = True
-    for name, script_path in scripts.items():
+    for name, (script_path, job_module) in scripts.items():
         print(f"\nTesting {name}...")
         try:
             # Try importing the main module to check dependencies
             result = subprocess.run(
-                [str(venv_python), '-c', f'import sys; sys.path.insert(0, "{project_root}"); exec(open("{script_path}").read().split("if __name__")[0])'],
+                [str(venv_python), '-c', f'import sys; sys.path.insert(0, "{project_root}"); exec(open("{script_path}").read().split("if __name__")[0]); import {job_module}'],
                 capture_output=True,
                 timeout=10,
                 cwd=str(project_root)
@@ -281,7 +359,11 @@ def main():
     # Run checks
     paths_ok = check_paths()
     scripts_ok = check_scripts_executable()
+    # Either scheduler is fine, so look for both
+    timers_installed = systemd_available() and check_systemd_timers()
     cron_installed = check_cron_jobs()
+    # Point at systemd when it is in use, or when nothing is installed yet and it is available
+    use_systemd = timers_installed or (not cron_installed and systemd_available())
     check_logs()
     
     # Summary
@@ -297,11 +379,17 @@ def main():
     else:
         print_error("Some scripts have issues")
     
+    if timers_installed:
+        print_success("systemd timers are installed")
     if cron_installed:
         print_success("Cron jobs are installed")
-    else:
-        print_error("Cron jobs are NOT installed")
-        show_cron_instructions()
+    if not (timers_installed or cron_installed):
+        if use_systemd:
+            print_error("Neither systemd timers nor cron jobs are installed")
+            show_systemd_instructions()
+        else:
+            print_error("Cron jobs are NOT installed")
+            show_cron_instructions()
     
     # Test manual execution (skip in non-interactive mode)
     try:
@@ -314,9 +402,14 @@ def main():
         pass
     
     print_header("Next Steps")
-    print("1. If cron jobs are not installed, follow the instructions above")
-    print("2. Verify cron jobs with: crontab -l")
-    print("3. Check logs after jobs run: tail -f logs/*.log")
+    if use_systemd:
+        print("1. If systemd timers are not installed, follow the instructions above")
+        print("2. Verify timers with: systemctl --user list-timers")
+        print("3. Check logs after jobs run: journalctl --user -u swing-finalization -u swing-pool-creation")
+    else:
+        print("1. If cron jobs are not installed, follow the instructions above")
+        print("2. Verify cron jobs with: crontab -l")
+        print("3. Check logs after jobs run: tail -f logs/*.log")
     print("4. Test manually: python scripts/run_finalization.py")
     print("\n")
 
@@ -1,10 +1,150 @@
 """Stock data fetching module using yfinance"""
 
+import functools
+import logging
+import os
+import threading
+import time
 import yfinance as yf
 import pandas as pd
-from typing import Optional
+from concurrent.futures import Future
+from typing import Dict, Iterator, List, Optional, Tuple
 from datetime import datetime, timedelta
 
+logger = logging.getLogger(__name__)
+
+# Maximum number of symbols per multi-symbol Yahoo Finance request
+BATCH_CHUNK_SIZE = 10
+
+# How long (in seconds) fetched results are reused, and how many are kept
+CACHE_TTL_SECONDS = 60
+CACHE_MAX_SIZE = 1024
+
+# Counters for calls that were served without hitting Yahoo Finance
+cache_stats = {'cached_dedupe': 0}
+
+# Connection pool size and retries of the requests.Session fallback. They
+# only apply when curl_cffi is not installed; yfinance releases that
+# require curl_cffi always get a curl_cffi session, which manages its own
+# connections and does not retry.
+HTTP_POOL_SIZE = 32
+
+# Retries for transient HTTP errors (rate limiting, server errors)
+HTTP_RETRIES = 2
+HTTP_BACKOFF_FACTOR = 0.3
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Timeout (in seconds) of each Yahoo Finance request, so one hung symbol
+# cannot stall the whole job
+FETCH_TIMEOUT_SECONDS = float(os.getenv("FETCH_TIMEOUT_SECONDS", "8"))
+
+
+def _build_session():
+    """
+    Build the HTTP session shared by all Yahoo Finance requests.
+    
+    Reusing one session keeps connections alive across symbols instead of
+    paying a new TCP+TLS handshake per request. When curl_cffi is installed
+    (a dependency of current yfinance releases, so the usual case) this is
+    a curl_cffi session with its default connection handling: no custom
+    pool size and no retries. Only older yfinance installs without
+    curl_cffi get a requests.Session with an HTTP_POOL_SIZE connection
+    pool and retries with backoff.
+    """
+    try:
+        from curl_cffi import requests as curl_requests
+    except ImportError:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=HTTP_POOL_SIZE,
+            pool_maxsize=HTTP_POOL_SIZE,
+            max_retries=Retry(
+                total=HTTP_RETRIES,
+                backoff_factor=HTTP_BACKOFF_FACTOR,
+                status_forcelist=HTTP_RETRY_STATUSES
+            )
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+    
+    return curl_requests.Session(impersonate="chrome")
+
+
+SESSION = _build_session()
+
+
+def _coalesced_cache(ttl: float = CACHE_TTL_SECONDS, maxsize: int = CACHE_MAX_SIZE):
+    """
+    Memoize a fetch function for `ttl` seconds and coalesce concurrent calls.
+    
+    While a fetch for a given set of arguments is in flight, other callers
+    with the same arguments wait for and share its result instead of
+    issuing a duplicate request. Failed fetches (None) are not cached.
+    
+    Args:
+        ttl: Number of seconds a successful result is reused
+        maxsize: Maximum number of cached results
+    """
+    def decorator(func):
+        cache = {}      # key -> (expires_at, value)
+        in_flight = {}  # key -> Future
+        lock = threading.Lock()
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (args, tuple(sorted(kwargs.items())))
+            
+            with lock:
+                entry = cache.get(key)
+                if entry is not None and entry[0] > time.monotonic():
+                    cache_stats['cached_dedupe'] += 1
+                    return entry[1]
+                
+                future = in_flight.get(key)
+                is_owner = future is None
+                if is_owner:
+                    future = Future()
+                    in_flight[key] = future
+                else:
+                    cache_stats['cached_dedupe'] += 1
+            
+            # Another caller is already fetching this key; share its result
+            if not is_owner:
+                return future.result()
+            
+            try:
+                value = func(*args, **kwargs)
+            except BaseException as e:
+                with lock:
+                    in_flight.pop(key, None)
+                future.set_exception(e)
+                raise
+            
+            with lock:
+                if value is not None:
+                    if len(cache) >= maxsize:
+                        # Drop the oldest entry (dicts keep insertion order)
+                        cache.pop(next(iter(cache)))
+                    cache[key] = (time.monotonic() + ttl, value)
+                in_flight.pop(key, None)
+            
+            future.set_result(value)
+            return value
+        
+        def cache_clear():
+            with lock:
+                cache.clear()
+        
+        wrapper.cache_clear = cache_clear
+        return wrapper
+    
+    return decorator
+
 
 def fetch_stock_data(
     symbol: str,
@@ -23,8 +163,8 @@ def fetch_stock_data(
         DataFrame with OHLC data, or None if fetch fails
     """
     try:
-        ticker = yf.Ticker(symbol)
-        df = ticker.history(period=period, interval=interval)
+        ticker = yf.Ticker(symbol, session=SESSION)
+        df = ticker.history(period=period, interval=interval, timeout=FETCH_TIMEOUT_SECONDS)
         
         if df.empty:
             return None
@@ -38,10 +178,11 @@ def fetch_stock_data(
         return df[required_cols].copy()
     
     except Exception as e:
-        print(f"Error fetching data for {symbol}: {e}")
+        logger.warning("Error fetching data for %s: %s", symbol, e)
         return None
 
 
+@_coalesced_cache()
 def fetch_stock_data_by_days(
     symbol: str,
     days: int = 30
@@ -61,8 +202,13 @@ def fetch_stock_data_by_days(
     start_date = end_date - timedelta(days=days + 10)  # Add buffer for weekends/holidays
     
     try:
-        ticker = yf.Ticker(symbol)
-        df = ticker.history(start=start_date, end=end_date, interval="1d")
+        ticker = yf.Ticker(symbol, session=SESSION)
+        df = ticker.history(
+            start=start_date,
+            end=end_date,
+            interval="1d",
+            timeout=FETCH_TIMEOUT_SECONDS
+        )
         
         if df.empty:
             return None
@@ -76,10 +222,11 @@ def fetch_stock_data_by_days(
         return df[required_cols].copy().sort_index()
     
     except Exception as e:
-        print(f"Error fetching data for {symbol}: {e}")
+        logger.warning("Error fetching data for %s: %s", symbol, e)
         return None
 
 
+@_coalesced_cache()
 def get_current_price(symbol: str) -> Optional[float]:
     """
     Get the current/latest price for a stock.
@@ -91,25 +238,117 @@ def get_current_price(symbol: str) -> Optional[float]:
         Current price as float, or None if fetch fails
     """
     try:
-        ticker = yf.Ticker(symbol)
-        info = ticker.info
+        ticker = yf.Ticker(symbol, session=SESSION)
         
-        # Try to get current price from info
-        if 'currentPrice' in info:
-            return float(info['currentPrice'])
-        elif 'regularMarketPrice' in info:
-            return float(info['regularMarketPrice'])
-        elif 'previousClose' in info:
-            return float(info['previousClose'])
+        # Try fast_info first: it reads a small quote endpoint instead of
+        # the full quote-summary blob behind ticker.info
+        try:
+            fast_info = ticker.fast_info
+            for key in ('last_price', 'previous_close'):
+                price = fast_info[key]
+                if price is not None and not pd.isna(price):
+                    return float(price)
+        except Exception as e:
+            logger.warning("Error reading fast_info for %s: %s", symbol, e)
         
         # Fallback: get latest close from history
-        hist = ticker.history(period="1d", interval="1d")
+        hist = ticker.history(period="1d", interval="1d", timeout=FETCH_TIMEOUT_SECONDS)
         if not hist.empty:
             return float(hist['Close'].iloc[-1])
         
         return None
     
     except Exception as e:
-        print(f"Error fetching current price for {symbol}: {e}")
+        logger.warning("Error fetching current price for %s: %s", symbol, e)
         return None
 
+
+
+def _download_batch(
+    symbols: List[str],
+    **kwargs
+) -> Iterator[Tuple[str, pd.DataFrame]]:
+    """
+    Download data for many symbols with one request per BATCH_CHUNK_SIZE symbols.
+    
+    Args:
+        symbols: List of stock symbols
+        **kwargs: Arguments passed to yf.download (period, start, interval, ...)
+    
+    Yields:
+        (symbol, DataFrame) pairs for each symbol that returned data
+    """
+    for start in range(0, len(symbols), BATCH_CHUNK_SIZE):
+        chunk = symbols[start:start + BATCH_CHUNK_SIZE]
+        
+        try:
+            df = yf.download(
+                " ".join(chunk),
+                group_by="ticker",
+                threads=True,
+                progress=False,
+                session=SESSION,
+                timeout=FETCH_TIMEOUT_SECONDS,
+                **kwargs
+            )
+        except Exception as e:
+            logger.warning("Error fetching data for %s: %s", ", ".join(chunk), e)
+            continue
+        
+        if df is None or df.empty:
+            continue
+        
+        for symbol in chunk:
+            # Multi-symbol downloads are grouped under a (symbol, field)
+            # column MultiIndex; single-symbol downloads may be flat
+            if isinstance(df.columns, pd.MultiIndex):
+                if symbol not in df.columns.get_level_values(0):
+                    continue
+                yield symbol, df[symbol]
+            else:
+                yield symbol, df
+
+
+def fetch_stock_data_batch(
+    symbols: List[str],
+    days: int = 30
+) -> Dict[str, pd.DataFrame]:
+    """
+    Fetch stock data for many symbols for a specific number of days.
+    
+    Equivalent to calling fetch_stock_data_by_days for every symbol, but
+    uses one multi-symbol request per BATCH_CHUNK_SIZE symbols.
+    
+    Args:
+        symbols: List of stock symbols (e.g., ["RELIANCE.NS", "SAIL.NS"])
+        days: Number of days to fetch
+    
+    Returns:
+        Dictionary mapping symbol to its OHLC DataFrame (oldest first).
+        Symbols whose data could not be fetched are omitted.
+    """
+    # Calculate start date
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=days + 10)  # Add buffer for weekends/holidays
+    
+    required_cols = ['Open', 'High', 'Low', 'Close']
+    frames = {}
+    
+    for symbol, df in _download_batch(
+        symbols,
+        start=start_date,
+        end=end_date,
+        interval="1d",
+        auto_adjust=True
+    ):
+        if not all(col in df.columns for col in required_cols):
+            continue
+        
+        # Rows are aligned across symbols, so drop dates this symbol lacks
+        df = df[required_cols].dropna(how='all')
+        if df.empty:
+            continue
+        
+        frames[symbol] = df.sort_index()
+    
+    return frames
@@ -1,21 +1,51 @@
 """Finalization job - checks pool stocks and generates buy signals"""
 
+import logging
+import numpy as np
 import pandas as pd
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Optional
 from datetime import datetime
-import pytz
 
-from .data_fetcher import fetch_stock_data_by_days
-from .heiken_ashi import calculate_heiken_ashi
+from .data_fetcher import fetch_stock_data_batch, fetch_stock_data_by_days
+from .heiken_ashi import calculate_heiken_ashi, calculate_heiken_ashi_batch
+from .storage import find_data_file, read_frame, write_frame_atomic
 
+logger = logging.getLogger(__name__)
 
-def get_today_heiken_ashi(symbol: str) -> Optional[dict]:
+# Number of concurrent single-symbol fetches for symbols missing from the
+# batch download. Keep this modest (8-16) to avoid HTTP 429 responses.
+FINALIZATION_WORKERS = int(os.getenv("FINALIZATION_WORKERS", "8"))
+
+# Days of data fetched to ensure we get today and yesterday
+TODAY_LOOKBACK_DAYS = 5
+
+# Columns of the final stocks output file
+_FINAL_COLUMNS = ('symbol', 'candle3_high', 'ha_open', 'ha_close', 'signal_date')
+
+
+def _write_empty(output_file: str) -> pd.DataFrame:
     """
-    Get today's and yesterday's Heiken Ashi data for a stock.
+    Write a final stocks file with headers only.
     
     Args:
-        symbol: Stock symbol
+        output_file: Path to output file (its directory must exist)
+    
+    Returns:
+        The empty DataFrame that was written
+    """
+    empty_df = pd.DataFrame(columns=list(_FINAL_COLUMNS))
+    write_frame_atomic(empty_df, output_file)
+    return empty_df
+
+
+def summarize_today_heiken_ashi(ha_df: pd.DataFrame) -> Optional[dict]:
+    """
+    Get today's and yesterday's Heiken Ashi data from recent HA candles.
+    
+    Args:
+        ha_df: DataFrame with recent Heiken Ashi OHLC data, sorted oldest first
     
     Returns:
         Dictionary with today's and yesterday's HA data:
@@ -28,44 +58,54 @@ def get_today_heiken_ashi(symbol: str) -> Optional[dict]:
         }
         or None if not available
     """
+    if ha_df is None or ha_df.empty:
+        return None
+    
+    # Look up each column once and index the arrays by position, instead
+    # of building a row Series per candle and looking up labels in it
+    closes = ha_df['Close'].to_numpy()
+    
+    # Get yesterday's close if available
+    yesterday_close = float(closes[-2]) if len(closes) >= 2 else None
+    
+    # The most recent candle is today's
+    return {
+        'today_open': float(ha_df['Open'].to_numpy()[-1]),
+        'today_close': float(closes[-1]),
+        'today_high': float(ha_df['High'].to_numpy()[-1]),
+        'today_low': float(ha_df['Low'].to_numpy()[-1]),
+        'yesterday_close': yesterday_close
+    }
+
+
+def get_today_heiken_ashi(symbol: str) -> Optional[dict]:
+    """
+    Get today's and yesterday's Heiken Ashi data for a stock.
+    
+    Args:
+        symbol: Stock symbol
+    
+    Returns:
+        Dictionary with today's and yesterday's HA data (see
+        summarize_today_heiken_ashi), or None if not available
+    """
     try:
-        # Fetch recent data (last 5 days to ensure we get today and yesterday)
-        df = fetch_stock_data_by_days(symbol, days=5)
+        df = fetch_stock_data_by_days(symbol, days=TODAY_LOOKBACK_DAYS)
         
         if df is None or df.empty:
             return None
         
         # Calculate Heiken Ashi
-        ha_df = calculate_heiken_ashi(df)
-        
-        if ha_df is None or ha_df.empty:
-            return None
-        
-        # Get the most recent (today's) candle
-        today_candle = ha_df.iloc[-1]
-        
-        # Get yesterday's close if available
-        yesterday_close = None
-        if len(ha_df) >= 2:
-            yesterday_candle = ha_df.iloc[-2]
-            yesterday_close = float(yesterday_candle['Close'])
-        
-        return {
-            'today_open': float(today_candle['Open']),
-            'today_close': float(today_candle['Close']),
-            'today_high': float(today_candle['High']),
-            'today_low': float(today_candle['Low']),
-            'yesterday_close': yesterday_close
-        }
+        return summarize_today_heiken_ashi(calculate_heiken_ashi(df))
     
     except Exception as e:
-        print(f"Error getting today's HA for {symbol}: {e}")
+        logger.warning("Error getting today's HA for %s: %s", symbol, e)
         return None
 
 
 def finalize_stocks(
-    pool_file: str = "data/pool.csv",
-    output_file: str = "data/final_stocks.csv"
+    pool_file: str = "data/pool.parquet",
+    output_file: str = "data/final_stocks.parquet"
 ) -> pd.DataFrame:
     """
     Finalize stocks from pool that meet buy signal criteria.
@@ -75,126 +115,149 @@ def finalize_stocks(
     2. Current Heiken Ashi close > Candle 3's high (breakout happened today)
     
     Args:
-        pool_file: Path to pool CSV file
-        output_file: Path to output CSV file
+        pool_file: Path to pool file (.parquet, or .csv). If it does not
+            exist, a legacy CSV file with the same name is used instead.
+        output_file: Path to output file (.parquet, or .csv)
     
     Returns:
         DataFrame with final stocks ready for investment
     """
-    print(f"Starting finalization job at {datetime.now()}")
+    logger.info("Starting finalization job at %s", datetime.now())
+    
+    # Ensure output directory exists (once, for every exit path below)
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
     
     # Read pool file
-    if not os.path.exists(pool_file):
-        print(f"Pool file not found: {pool_file}")
-        print("Please run pool creation job first.")
-        # Create empty CSV
-        empty_df = pd.DataFrame(columns=[
-            'symbol', 'candle3_high', 'ha_open', 'ha_close', 'signal_date'
-        ])
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
-        empty_df.to_csv(output_file, index=False)
-        return empty_df
-    
-    pool_df = pd.read_csv(pool_file)
+    pool_path = find_data_file(pool_file)
+    if pool_path is None:
+        logger.warning("Pool file not found: %s. Please run pool creation job first.", pool_file)
+        return _write_empty(output_file)
+    
+    pool_df = read_frame(pool_path)
     
     if pool_df.empty:
-        print("Pool is empty. No stocks to finalize.")
-        # Create empty CSV
-        empty_df = pd.DataFrame(columns=[
-            'symbol', 'candle3_high', 'ha_open', 'ha_close', 'signal_date'
-        ])
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
-        empty_df.to_csv(output_file, index=False)
-        return empty_df
-    
-    print(f"Checking {len(pool_df)} stocks from pool...")
-    
-    final_stocks = []
-    
-    for idx, row in pool_df.iterrows():
-        symbol = row['symbol']
-        candle3_high = float(row['candle3_high'])
-        
-        print(f"Checking {symbol}...", end=" ")
+        logger.info("Pool is empty. No stocks to finalize.")
+        return _write_empty(output_file)
+    
+    logger.info("Checking %d stocks from pool...", len(pool_df))
+    
+    symbols = list(pool_df['symbol'].unique())
+    
+    # Fetch recent data for all symbols with multi-symbol requests
+    batch_data = fetch_stock_data_batch(symbols, days=TODAY_LOOKBACK_DAYS)
+    
+    # Calculate Heiken Ashi for all fetched symbols in one vectorized pass
+    batch_ha = calculate_heiken_ashi_batch(batch_data)
+    
+    today_records = []
+    missing_symbols = []
+    
+    for symbol in symbols:
+        if symbol not in batch_data:
+            missing_symbols.append(symbol)
+            continue
         
         try:
-            # Get today's Heiken Ashi data
-            today_ha = get_today_heiken_ashi(symbol)
-            
-            if today_ha is None:
-                print("Failed to get today's Heiken Ashi data")
-                continue
-            
-            ha_open = today_ha['today_open']
-            ha_close = today_ha['today_close']
-            yesterday_close = today_ha['yesterday_close']
-            
-            print(f"HA Open: {ha_open:.2f}, HA Close: {ha_close:.2f}, Candle 3 High: {candle3_high:.2f}", end=" ")
-            
-            # Check criteria:
-            # 1. Today's open < Candle 3 high (breakout hasn't happened at open)
-            # 2. Current close > Candle 3 high (breakout happened)
-            # 3. Yesterday's close < Candle 3 high (breakout happened TODAY, not earlier)
-            breakout_today = False
-            
-            if ha_open < candle3_high and ha_close > candle3_high:
-                # Check if breakout happened today (yesterday was below)
-                if yesterday_close is not None:
-                    if yesterday_close < candle3_high:
-                        breakout_today = True
-                    else:
-                        print("✗ Breakout happened earlier (yesterday close >= Candle 3 high)")
-                else:
-                    # If we don't have yesterday's data, assume breakout is today
-                    breakout_today = True
-            
-            if breakout_today:
-                print("✓ BUY SIGNAL (breakout today)")
-                final_stocks.append({
-                    'symbol': symbol,
-                    'candle3_high': candle3_high,
-                    'ha_open': ha_open,
-                    'ha_close': ha_close,
-                    'signal_date': datetime.now()
-                })
-            elif ha_close <= candle3_high:
-                print("✗ No breakout (HA close <= Candle 3 high)")
-            elif ha_open >= candle3_high:
-                print("✗ Breakout already happened (HA open >= Candle 3 high)")
-            else:
-                print("✗ No signal")
-        
+            today_ha = summarize_today_heiken_ashi(batch_ha.get(symbol))
         except Exception as e:
-            print(f"Error: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("Checking %s... Error: %s", symbol, e)
             continue
-    
-    # Create DataFrame
-    if final_stocks:
-        final_df = pd.DataFrame(final_stocks)
-        
-        # Ensure output directory exists
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
         
-        # Save to CSV
-        final_df.to_csv(output_file, index=False)
-        print(f"\nFinalization completed. Found {len(final_df)} stocks with buy signals.")
-        print(f"Results saved to {output_file}")
+        if today_ha is None:
+            logger.info("Checking %s... Failed to get today's Heiken Ashi data", symbol)
+            continue
         
-        return final_df
-    else:
-        print("\nFinalization completed. No stocks with buy signals found.")
-        # Create empty CSV with headers
-        empty_df = pd.DataFrame(columns=[
-            'symbol', 'candle3_high', 'ha_open', 'ha_close', 'signal_date'
-        ])
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
-        empty_df.to_csv(output_file, index=False)
-        return empty_df
+        today_records.append({'symbol': symbol, **today_ha})
+    
+    # Retry symbols the batch download missed one at a time, concurrently
+    if missing_symbols:
+        with ThreadPoolExecutor(max_workers=FINALIZATION_WORKERS) as executor:
+            futures = {
+                executor.submit(get_today_heiken_ashi, symbol): symbol
+                for symbol in missing_symbols
+            }
+            
+            for future in as_completed(futures):
+                symbol = futures[future]
+                
+                try:
+                    today_ha = future.result()
+                except Exception as e:
+                    logger.exception("Checking %s... Error: %s", symbol, e)
+                    continue
+                
+                if today_ha is None:
+                    logger.info("Checking %s... Failed to get today's Heiken Ashi data", symbol)
+                    continue
+                
+                today_records.append({'symbol': symbol, **today_ha})
+    
+    today_df = pd.DataFrame(today_records, columns=[
+        'symbol', 'today_open', 'today_close', 'today_high', 'today_low',
+        'yesterday_close'
+    ])
+    checked_df = pool_df.merge(today_df, on='symbol', how='inner')
+    
+    # Materialize the columns as NumPy arrays once; everything below works
+    # on plain arrays without pandas indexing overhead
+    checked_symbols = checked_df['symbol'].to_numpy(dtype=object)
+    candle3_high = checked_df['candle3_high'].to_numpy(dtype=np.float64)
+    ha_open = checked_df['today_open'].to_numpy(dtype=np.float64)
+    ha_close = checked_df['today_close'].to_numpy(dtype=np.float64)
+    yesterday_close = checked_df['yesterday_close'].to_numpy(dtype=np.float64, na_value=np.nan)
+    
+    # Check criteria:
+    # 1. Today's open < Candle 3 high (breakout hasn't happened at open)
+    # 2. Current close > Candle 3 high (breakout happened)
+    # 3. Yesterday's close < Candle 3 high (breakout happened TODAY, not earlier).
+    #    If we don't have yesterday's data, assume breakout is today
+    breakout = (ha_open < candle3_high) & (ha_close > candle3_high)
+    breakout_today = breakout & (np.isnan(yesterday_close) | (yesterday_close < candle3_high))
+    
+    status = np.select(
+        [
+            breakout_today,
+            breakout,
+            ha_close <= candle3_high,
+            ha_open >= candle3_high
+        ],
+        [
+            "✓ BUY SIGNAL (breakout today)",
+            "✗ Breakout happened earlier (yesterday close >= Candle 3 high)",
+            "✗ No breakout (HA close <= Candle 3 high)",
+            "✗ Breakout already happened (HA open >= Candle 3 high)"
+        ],
+        default="✗ No signal"
+    )
+    
+    for symbol, o, c, high, result in zip(checked_symbols, ha_open, ha_close, candle3_high, status):
+        logger.info(
+            "Checking %s... HA Open: %.2f, HA Close: %.2f, Candle 3 High: %.2f %s",
+            symbol, o, c, high, result
+        )
+    
+    final_df = pd.DataFrame({
+        'symbol': checked_symbols[breakout_today],
+        'candle3_high': candle3_high[breakout_today],
+        'ha_open': ha_open[breakout_today],
+        'ha_close': ha_close[breakout_today],
+        'signal_date': datetime.now()
+    })
+    
+    if final_df.empty:
+        logger.info("Finalization completed. No stocks with buy signals found.")
+        return _write_empty(output_file)
+    
+    # Save results
+    write_frame_atomic(final_df, output_file)
+    logger.info("Finalization completed. Found %d stocks with buy signals.", len(final_df))
+    logger.info("Results saved to %s", output_file)
+    
+    return final_df
 
 
 if __name__ == "__main__":
     # For testing
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     finalize_stocks()
 
@@ -1,10 +1,147 @@
 """Heiken Ashi candle calculation module"""
 
+import numpy as np
 import pandas as pd
-from typing import Optional
+from dataclasses import dataclass
+from typing import Dict, Optional, Union
 
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional; the HA_Open scan then runs as plain Python
+    njit = None
 
-def calculate_heiken_ashi(df: pd.DataFrame) -> Optional[pd.DataFrame]:
+
+@dataclass(frozen=True)
+class HACandles:
+    """
+    Heiken Ashi candles of one stock as plain arrays, sorted oldest first.
+    
+    The OHLC arrays are float64 arrays of equal length; `dates`
+    is the original DataFrame index, so candle dates keep their type
+    (and timezone).
+    """
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    dates: pd.Index
+    
+    def __len__(self) -> int:
+        return len(self.close)
+    
+    @classmethod
+    def from_frame(cls, ha_df: pd.DataFrame) -> Optional['HACandles']:
+        """
+        Wrap a Heiken Ashi DataFrame (as returned by calculate_heiken_ashi).
+        
+        Args:
+            ha_df: DataFrame with columns ['Open', 'High', 'Low', 'Close']
+        
+        Returns:
+            HACandles, or None if a required column is missing
+        """
+        required_cols = ['Open', 'High', 'Low', 'Close']
+        if not all(col in ha_df.columns for col in required_cols):
+            return None
+        
+        return cls(
+            open=ha_df['Open'].to_numpy(dtype=np.float64),
+            high=ha_df['High'].to_numpy(dtype=np.float64),
+            low=ha_df['Low'].to_numpy(dtype=np.float64),
+            close=ha_df['Close'].to_numpy(dtype=np.float64),
+            dates=ha_df.index
+        )
+    
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Convert to a DataFrame with columns ['Open', 'High', 'Low', 'Close'].
+        
+        The arrays are wrapped rather than copied.
+        """
+        return pd.DataFrame({
+            'Open': self.open,
+            'High': self.high,
+            'Low': self.low,
+            'Close': self.close
+        }, index=self.dates, copy=False)
+
+
+def as_ha_candles(
+    ha: Union[pd.DataFrame, HACandles, None]
+) -> Optional[HACandles]:
+    """
+    Accept Heiken Ashi candles either as HACandles or as a DataFrame.
+    
+    Args:
+        ha: HACandles, or DataFrame with columns ['Open', 'High', 'Low', 'Close']
+    
+    Returns:
+        HACandles, or None if the input is None or invalid
+    """
+    if ha is None or isinstance(ha, HACandles):
+        return ha
+    return HACandles.from_frame(ha)
+
+
+def _ha_open_scan_py(
+    open_arr: np.ndarray,
+    close_arr: np.ndarray,
+    ha_close_arr: np.ndarray,
+    starts: np.ndarray
+) -> np.ndarray:
+    """
+    Compute HA_Open, the only serially dependent Heiken Ashi value.
+    
+    Several stocks can be processed in one call by concatenating their
+    candles; `starts` marks the first candle of each stock.
+    
+    Args:
+        open_arr: Regular open prices
+        close_arr: Regular close prices
+        ha_close_arr: Heiken Ashi close prices
+        starts: Boolean array, True where a new stock's candles begin
+    
+    Returns:
+        Array of HA_Open values
+    """
+    n = len(ha_close_arr)
+    ha_open = np.empty(n)
+    
+    for i in range(n):
+        if starts[i]:
+            # First candle: HA_Open = (regular Open + regular Close) / 2
+            ha_open[i] = (open_arr[i] + close_arr[i]) / 2.0
+        else:
+            # HA_Open = (Previous HA_Open + Previous HA_Close) / 2
+            ha_open[i] = (ha_open[i - 1] + ha_close_arr[i - 1]) / 2.0
+    
+    return ha_open
+
+
+if njit is not None:
+    # cache=True keeps the compiled scan in __pycache__ across runs
+    _ha_open_scan = njit(cache=True, fastmath=True)(_ha_open_scan_py)
+    
+    # Compile at import time rather than on the first stock
+    _ha_open_scan(np.zeros(1), np.zeros(1), np.zeros(1), np.ones(1, dtype=np.bool_))
+else:
+    _ha_open_scan = _ha_open_scan_py
+
+
+def _max3(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """Element-wise maximum of three arrays, with one output allocation."""
+    out = np.maximum(a, b)
+    return np.maximum(out, c, out=out)
+
+
+def _min3(a: np.ndarray, b: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """Element-wise minimum of three arrays, with one output allocation."""
+    out = np.minimum(a, b)
+    return np.minimum(out, c, out=out)
+
+
+def calculate_heiken_ashi_candles(df: pd.DataFrame) -> Optional[HACandles]:
     """
     Convert regular OHLC candles to Heiken Ashi candles.
     
@@ -19,7 +156,7 @@ def calculate_heiken_ashi(df: pd.DataFrame) -> Optional[pd.DataFrame]:
             Index should be datetime, sorted oldest first
     
     Returns:
-        DataFrame with Heiken Ashi OHLC values, or None if input is invalid
+        HACandles with the Heiken Ashi OHLC values, or None if input is invalid
     """
     if df is None or df.empty:
         return None
@@ -28,56 +165,107 @@ def calculate_heiken_ashi(df: pd.DataFrame) -> Optional[pd.DataFrame]:
     if not all(col in df.columns for col in required_cols):
         return None
     
-    # Create a copy to avoid modifying original
-    ha_df = df.copy()
+    # Plain float64 views of the input columns (no copy for float64 data)
+    o = df['Open'].to_numpy(dtype=np.float64)
+    h = df['High'].to_numpy(dtype=np.float64)
+    l = df['Low'].to_numpy(dtype=np.float64)
+    c = df['Close'].to_numpy(dtype=np.float64)
     
-    # Initialize Heiken Ashi columns
-    ha_df['HA_Close'] = (ha_df['Open'] + ha_df['High'] + ha_df['Low'] + ha_df['Close']) / 4.0
+    # Single stock: only the first candle starts a new HA_Open series
+    starts = np.zeros(len(df), dtype=np.bool_)
+    starts[0] = True
     
-    # Calculate HA_Open (needs previous values)
-    ha_df['HA_Open'] = 0.0
-    ha_df['HA_High'] = 0.0
-    ha_df['HA_Low'] = 0.0
+    ha_close = (o + h + l + c) / 4.0
+    ha_open = _ha_open_scan(o, c, ha_close, starts)
+    ha_high = _max3(h, ha_open, ha_close)
+    ha_low = _min3(l, ha_open, ha_close)
     
-    # First candle: HA_Open = (regular Open + regular Close) / 2
-    ha_df.iloc[0, ha_df.columns.get_loc('HA_Open')] = (
-        ha_df.iloc[0]['Open'] + ha_df.iloc[0]['Close']
-    ) / 2.0
+    return HACandles(
+        open=ha_open,
+        high=ha_high,
+        low=ha_low,
+        close=ha_close,
+        dates=df.index
+    )
+
+
+def calculate_heiken_ashi(df: pd.DataFrame) -> Optional[pd.DataFrame]:
+    """
+    Convert regular OHLC candles to Heiken Ashi candles.
     
-    # Calculate for remaining candles
-    for i in range(1, len(ha_df)):
-        prev_ha_open = ha_df.iloc[i-1]['HA_Open']
-        prev_ha_close = ha_df.iloc[i-1]['HA_Close']
-        
-        # HA_Open = (Previous HA_Open + Previous HA_Close) / 2
-        ha_df.iloc[i, ha_df.columns.get_loc('HA_Open')] = (
-            prev_ha_open + prev_ha_close
-        ) / 2.0
-    
-    # Calculate HA_High and HA_Low for all candles
-    for i in range(len(ha_df)):
-        ha_open = ha_df.iloc[i]['HA_Open']
-        ha_close = ha_df.iloc[i]['HA_Close']
-        regular_high = ha_df.iloc[i]['High']
-        regular_low = ha_df.iloc[i]['Low']
-        
-        # HA_High = max(High, HA_Open, HA_Close)
-        ha_df.iloc[i, ha_df.columns.get_loc('HA_High')] = max(
-            regular_high, ha_open, ha_close
-        )
-        
-        # HA_Low = min(Low, HA_Open, HA_Close)
-        ha_df.iloc[i, ha_df.columns.get_loc('HA_Low')] = min(
-            regular_low, ha_open, ha_close
-        )
+    See calculate_heiken_ashi_candles for the formulas.
+    
+    Args:
+        df: DataFrame with columns ['Open', 'High', 'Low', 'Close']
+            Index should be datetime, sorted oldest first
+    
+    Returns:
+        DataFrame with Heiken Ashi OHLC values, or None if input is invalid
+    """
+    candles = calculate_heiken_ashi_candles(df)
+    if candles is None:
+        return None
     
     # Create result DataFrame with standard column names
+    return candles.to_frame()
+
+
+def calculate_heiken_ashi_batch(
+    data: Dict[str, pd.DataFrame]
+) -> Dict[str, pd.DataFrame]:
+    """
+    Convert regular OHLC candles of many stocks to Heiken Ashi candles at once.
+    
+    All stocks are stacked into one long DataFrame, so HA_Close, HA_High
+    and HA_Low are computed with single vectorized operations and HA_Open
+    with one pass of the (numba-compiled, when available) scan.
+    
+    Args:
+        data: Dictionary mapping symbol to a DataFrame with columns
+              ['Open', 'High', 'Low', 'Close'], sorted oldest first
+    
+    Returns:
+        Dictionary mapping symbol to its Heiken Ashi OHLC DataFrame.
+        Symbols with empty or invalid input are omitted.
+    """
+    required_cols = ['Open', 'High', 'Low', 'Close']
+    frames = {
+        symbol: df[required_cols]
+        for symbol, df in data.items()
+        if df is not None and not df.empty
+        and all(col in df.columns for col in required_cols)
+    }
+    
+    if not frames:
+        return {}
+    
+    # Stack into one long DataFrame indexed by (symbol, date)
+    long_df = pd.concat(frames, names=['symbol', None])
+    
+    o = long_df['Open'].to_numpy(dtype=np.float64)
+    h = long_df['High'].to_numpy(dtype=np.float64)
+    l = long_df['Low'].to_numpy(dtype=np.float64)
+    c = long_df['Close'].to_numpy(dtype=np.float64)
+    
+    # Mark the first candle of each stock
+    symbol_codes = long_df.index.codes[0]
+    starts = np.empty(len(symbol_codes), dtype=np.bool_)
+    starts[0] = True
+    starts[1:] = symbol_codes[1:] != symbol_codes[:-1]
+    
+    ha_close = (o + h + l + c) / 4.0
+    ha_open = _ha_open_scan(o, c, ha_close, starts)
+    ha_high = _max3(h, ha_open, ha_close)
+    ha_low = _min3(l, ha_open, ha_close)
+    
     result = pd.DataFrame({
-        'Open': ha_df['HA_Open'],
-        'High': ha_df['HA_High'],
-        'Low': ha_df['HA_Low'],
-        'Close': ha_df['HA_Close']
-    }, index=ha_df.index)
+        'Open': ha_open,
+        'High': ha_high,
+        'Low': ha_low,
+        'Close': ha_close
+    }, index=long_df.index, copy=False)
     
-    return result
-
+    return {
+        symbol: ha_df.droplevel(0)
+        for symbol, ha_df in result.groupby(level=0, sort=False)
+    }
@@ -0,0 +1,35 @@
+"""Logging configuration for the job scripts"""
+
+import logging
+import logging.handlers
+import queue
+import sys
+
+
+def setup_logging(level: int = logging.INFO) -> logging.handlers.QueueListener:
+    """
+    Configure the root logger to write through a queue.
+    
+    Log calls only enqueue the record; a background listener thread does
+    the actual (blocking) write to stdout, which cron redirects to the
+    job's log file. This keeps slow log I/O out of worker threads.
+    
+    Args:
+        level: Minimum level of records to emit
+    
+    Returns:
+        The started QueueListener. Call stop() before exiting to flush
+        any queued records.
+    """
+    log_queue = queue.Queue(-1)
+    
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    
+    root = logging.getLogger()
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    listener.start()
+    return listener
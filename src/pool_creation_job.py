@@ -1,18 +1,63 @@
 """Pool creation job - scans stocks and identifies trends"""
 
+import logging
+import numpy as np
 import pandas as pd
 import os
-from typing import List
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional, Tuple, Union
+from datetime import datetime, time as dt_time, timedelta
 
 from .data_fetcher import fetch_stock_data_by_days
-from .heiken_ashi import calculate_heiken_ashi
-from .trend_detector import find_trends_in_stock
+from .heiken_ashi import HACandles, as_ha_candles, calculate_heiken_ashi_candles
+from .trend_detector import detect_trends_batch
+from .storage import read_frame, write_frame_atomic
+from .tz import IST
 from config.stocks import NIFTY_500_STOCKS, LOOKBACK_DAYS
 
+logger = logging.getLogger(__name__)
+
+# Number of stocks fetched concurrently. Keep this modest (8-16) to avoid
+# HTTP 429 responses from Yahoo Finance.
+POOL_WORKERS = int(os.getenv("POOL_WORKERS", "12"))
+
+# Per-stock Heiken Ashi candles from earlier runs, reused until the next
+# market close
+HA_CACHE_DIR = "data/cache"
+
+# NSE closing time; daily bars fetched after it are final for the day
+MARKET_CLOSE = dt_time(15, 30)
+
+# Fraction of scanned stocks that may fail with unexpected errors before the
+# whole run is treated as failed (a bug hitting every stock must not look
+# like a day without trends)
+MAX_ERROR_RATIO = 0.5
+
+# Status returned for a stock skipped after an unexpected error (already
+# logged with its traceback)
+_UNEXPECTED_ERROR = "Unexpected error"
+
+# Columns of the pool output file
+_POOL_COLUMNS = (
+    'symbol', 'candle1_date', 'candle2_date', 'candle3_date',
+    'candle3_high', 'detection_date'
+)
+
+
+def _to_days(index: pd.DatetimeIndex) -> np.ndarray:
+    """
+    Convert timestamps to their calendar days as a datetime64[D] array.
+    
+    Timezone-aware timestamps keep their local date (e.g., IST midnight
+    stays on the same day instead of moving to the previous UTC day).
+    """
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.to_numpy().astype('datetime64[D]')
+
 
 def check_reversal_already_crossed(
-    ha_df: pd.DataFrame,
+    ha_df: Union[pd.DataFrame, HACandles],
     candle1_date: datetime,
     candle3_high: float
 ) -> bool:
@@ -20,34 +65,245 @@ def check_reversal_already_crossed(
     Check if reversal signal has already been crossed.
     
     Args:
-        ha_df: Heiken Ashi DataFrame
+        ha_df: Heiken Ashi candles (HACandles or DataFrame)
         candle1_date: Date of Candle 1 (newest candle in trend)
         candle3_high: High value of Candle 3 (oldest candle in trend)
     
     Returns:
         True if reversal already crossed, False otherwise
     """
-    # Find the index of Candle 1 in the dataframe
-    candle1_idx = None
-    for idx in ha_df.index:
-        idx_date = idx.date() if isinstance(idx, datetime) else pd.Timestamp(idx).date()
-        candle1_date_obj = candle1_date.date() if isinstance(candle1_date, datetime) else pd.Timestamp(candle1_date).date()
-        if idx_date == candle1_date_obj:
-            candle1_idx = ha_df.index.get_loc(idx)
-            break
+    candles = as_ha_candles(ha_df)
+    if candles is None:
+        return False
+    
+    # Calendar days of all candles as datetime64[D] (index is sorted), so
+    # the lookup below compares plain integers
+    days = _to_days(pd.DatetimeIndex(candles.dates))
+    target = _to_days(pd.DatetimeIndex([candle1_date]))[0]
+    
+    # Find the position of Candle 1 in the dataframe
+    candle1_idx = np.searchsorted(days, target)
+    if candle1_idx == len(days) or days[candle1_idx] != target:
+        return False
+    
+    # Check if reversal already happened on any day after Candle 1
+    return bool((candles.close[candle1_idx + 1:] > candle3_high).any())
+
+
+def _last_market_close() -> datetime:
+    """
+    Get the most recent NSE market close (today's, or yesterday's before it).
+    
+    Weekends and holidays are not skipped, so a cache written on the last
+    trading day is treated as stale one day early; that only costs a refetch.
+    """
+    now = datetime.now(IST)
+    close = datetime.combine(now.date(), MARKET_CLOSE, tzinfo=IST)
+    if now < close:
+        close -= timedelta(days=1)
+    return close
+
+
+def _load_or_fetch(symbol: str, days: int) -> Optional[HACandles]:
+    """
+    Get a stock's Heiken Ashi candles, reusing the on-disk cache if fresh.
+    
+    Cached candles are used if they were written after the most recent
+    market close and after the close of their newest bar's day (so that
+    bar is final, not an intraday snapshot), and reach back at least
+    `days` days. Otherwise the stock data is fetched, converted and
+    written to HA_CACHE_DIR for later runs.
+    
+    Args:
+        symbol: Stock symbol
+        days: Number of days of history needed
+    
+    Returns:
+        HACandles, or None if no data is available
+    """
+    cache_file = os.path.join(HA_CACHE_DIR, f"{symbol}.parquet")
+    
+    written = None
+    if os.path.exists(cache_file):
+        written = datetime.fromtimestamp(os.path.getmtime(cache_file), IST)
+    
+    if written is not None and written >= _last_market_close():
+        try:
+            ha_df = read_frame(cache_file).set_index('Date')
+            # Timestamp.date() keeps the exchange-local date for tz-aware bars
+            oldest_needed = datetime.now(IST).date() - timedelta(days=days)
+            newest_close = datetime.combine(pd.Timestamp(ha_df.index[-1]).date(),
+                                            MARKET_CLOSE, tzinfo=IST)
+            if (written >= newest_close and
+                    pd.Timestamp(ha_df.index[0]).date() <= oldest_needed):
+                return HACandles.from_frame(ha_df)
+        except Exception as e:
+            logger.warning("Error reading Heiken Ashi cache for %s: %s", symbol, e)
+    
+    # Fetch stock data (network errors are handled by the fetcher)
+    df = fetch_stock_data_by_days(symbol, days=days)
+    
+    if df is None or df.empty:
+        return None
+    
+    ha_candles = calculate_heiken_ashi_candles(df)
+    if ha_candles is None:
+        return None
+    
+    try:
+        write_frame_atomic(ha_candles.to_frame().rename_axis('Date').reset_index(), cache_file)
+    except Exception as e:
+        logger.warning("Error writing Heiken Ashi cache for %s: %s", symbol, e)
+    
+    return ha_candles
+
+
+def _fetch_candles(symbol: str) -> Tuple[Optional[HACandles], Optional[str]]:
+    """
+    Get one stock's Heiken Ashi candles (cached or freshly fetched).
+    
+    Args:
+        symbol: Stock symbol
+    
+    Errors are logged here and only skip this symbol: malformed data as a
+    warning, anything else (a bug) with its traceback.
+    
+    Returns:
+        Tuple of (HACandles, or None if no data is available, and a short
+        status message for the progress output: None after malformed data,
+        _UNEXPECTED_ERROR after any other error)
+    """
+    try:
+        ha_candles = _load_or_fetch(symbol, days=LOOKBACK_DAYS)
+    except (KeyError, ValueError) as e:
+        logger.warning("%s: Malformed data: %s", symbol, e)
+        return None, None
+    except Exception as e:
+        logger.exception("%s: Unexpected error fetching data: %s", symbol, e)
+        return None, _UNEXPECTED_ERROR
     
-    # Check if reversal already happened after Candle 1
-    if candle1_idx is not None and candle1_idx < len(ha_df) - 1:
-        # Check all days after Candle 1
-        for idx in range(candle1_idx + 1, len(ha_df)):
-            day_ha_close = ha_df.iloc[idx]['Close']
-            if day_ha_close > candle3_high:
-                return True
+    if ha_candles is None or len(ha_candles) == 0:
+        return None, "No data"
     
-    return False
+    return ha_candles, f"{len(ha_candles)} candles"
 
 
-def create_pool(output_file: str = "data/pool.csv") -> pd.DataFrame:
+def _pool_row(
+    symbol: str,
+    ha_candles: HACandles,
+    trend: Optional[dict]
+) -> Tuple[Optional[dict], Optional[str]]:
+    """
+    Build a stock's pool row if it has a trend that has not reversed yet.
+    
+    Args:
+        symbol: Stock symbol
+        ha_candles: Heiken Ashi candles of the stock
+        trend: Trend detected in the candles, or None
+    
+    Errors are logged here and only skip this symbol, as in _fetch_candles.
+    
+    Returns:
+        Tuple of (pool row, or None if the stock is not added to the pool,
+        and a short status message for the progress output, or None /
+        _UNEXPECTED_ERROR after an error as in _fetch_candles)
+    """
+    if not trend:
+        return None, "No trend"
+    
+    # Check if reversal signal has already been crossed
+    # We only want stocks where the trend exists but hasn't been breached yet
+    candle1_date = trend['candle1_date']
+    candle3_high = trend['candle3_high']
+    
+    try:
+        reversal_already_crossed = check_reversal_already_crossed(
+            ha_candles, candle1_date, candle3_high
+        )
+    except (KeyError, ValueError) as e:
+        logger.warning("%s: Malformed data: %s", symbol, e)
+        return None, None
+    except Exception as e:
+        logger.exception("%s: Unexpected error checking reversal: %s", symbol, e)
+        return None, _UNEXPECTED_ERROR
+    
+    if reversal_already_crossed:
+        return None, f"Trend found but reversal already crossed (Candle 3 high: {candle3_high:.2f})"
+    
+    return {
+        'symbol': symbol,
+        'candle1_date': trend['candle1_date'],
+        'candle2_date': trend['candle2_date'],
+        'candle3_date': trend['candle3_date'],
+        'candle3_high': trend['candle3_high'],
+        'detection_date': trend['detection_date']
+    }, f"Trend found! Candle 3 high: {candle3_high:.2f}"
+
+
+def _scan_stocks(detection_date: datetime) -> pd.DataFrame:
+    """
+    Fetch all stocks, detect trends and build the pool rows.
+    
+    Args:
+        detection_date: Detection date recorded for trends found in this run
+    
+    Returns:
+        DataFrame with the pool rows (columns _POOL_COLUMNS)
+    
+    Raises:
+        RuntimeError: If more than MAX_ERROR_RATIO of the stocks failed with
+            unexpected errors
+    """
+    os.makedirs(HA_CACHE_DIR, exist_ok=True)
+    
+    with ThreadPoolExecutor(max_workers=POOL_WORKERS) as executor:
+        futures = {
+            executor.submit(_fetch_candles, symbol): symbol
+            for symbol in NIFTY_500_STOCKS
+        }
+        
+        # Report fetch progress; stocks without data are reported here
+        candles = {}
+        errors = 0
+        for i, future in enumerate(as_completed(futures), 1):
+            symbol = futures[future]
+            ha_candles, status = future.result()
+            
+            if status == _UNEXPECTED_ERROR:
+                errors += 1
+            elif ha_candles is None:
+                if status is not None:
+                    logger.info("[%d/%d] %s: %s", i, len(NIFTY_500_STOCKS), symbol, status)
+            else:
+                logger.debug("[%d/%d] %s: %s", i, len(NIFTY_500_STOCKS), symbol, status)
+                candles[symbol] = ha_candles
+    
+    # Detect trends in all fetched stocks with one set of array operations
+    trends = detect_trends_batch(candles, detection_date)
+    
+    # Check each trend for a reversal, in stock list order
+    outcomes = [
+        (symbol, *_pool_row(symbol, candles[symbol], trends.get(symbol)))
+        for symbol in NIFTY_500_STOCKS if symbol in candles
+    ]
+    for symbol, _, status in outcomes:
+        if status == _UNEXPECTED_ERROR:
+            errors += 1
+        elif status is not None:
+            logger.info("%s: %s", symbol, status)
+    
+    if errors > len(NIFTY_500_STOCKS) * MAX_ERROR_RATIO:
+        raise RuntimeError(
+            f"{errors} of {len(NIFTY_500_STOCKS)} stocks failed with unexpected errors"
+        )
+    
+    # Create DataFrame in one go
+    pool_results = [row for _, row, _ in outcomes if row is not None]
+    pool_df = pd.DataFrame(pool_results, columns=list(_POOL_COLUMNS))
+    return pool_df
+
+
+def create_pool(output_file: str = "data/pool.parquet") -> pd.DataFrame:
     """
     Create pool of stocks that satisfy the trend criteria.
     
@@ -57,95 +313,48 @@ def create_pool(output_file: str = "data/pool.csv") -> pd.DataFrame:
        where HA close > Candle 3 high)
     
     This ensures we only track stocks with active trends that haven't 
-    already reversed.
+    already reversed. Stocks are fetched concurrently with POOL_WORKERS
+    threads, then checked for trends all at once.
     
     Args:
-        output_file: Path to output CSV file
+        output_file: Path to output file (.parquet, or .csv)
     
     Returns:
         DataFrame with stocks that have detected trends (not yet breached)
     """
-    print(f"Starting pool creation job at {datetime.now()}")
-    print(f"Scanning {len(NIFTY_500_STOCKS)} stocks...")
+    # One detection date for every trend found in this run
+    detection_date = datetime.now()
     
-    pool_results = []
+    logger.info("Starting pool creation job at %s", detection_date)
+    logger.info("Scanning %d stocks...", len(NIFTY_500_STOCKS))
     
-    for i, symbol in enumerate(NIFTY_500_STOCKS, 1):
-        print(f"[{i}/{len(NIFTY_500_STOCKS)}] Processing {symbol}...", end=" ")
-        
-        try:
-            # Fetch stock data
-            df = fetch_stock_data_by_days(symbol, days=LOOKBACK_DAYS)
-            
-            if df is None or df.empty:
-                print("No data")
-                continue
-            
-            # Calculate Heiken Ashi candles
-            ha_df = calculate_heiken_ashi(df)
-            
-            if ha_df is None or ha_df.empty:
-                print("Failed to calculate Heiken Ashi")
-                continue
-            
-            # Detect trend
-            trend = find_trends_in_stock(symbol, ha_df)
-            
-            if trend:
-                # Check if reversal signal has already been crossed
-                # We only want stocks where the trend exists but hasn't been breached yet
-                candle1_date = trend['candle1_date']
-                candle3_high = trend['candle3_high']
-                
-                reversal_already_crossed = check_reversal_already_crossed(
-                    ha_df, candle1_date, candle3_high
-                )
-                
-                if reversal_already_crossed:
-                    print(f"Trend found but reversal already crossed (Candle 3 high: {candle3_high:.2f})")
-                else:
-                    print(f"Trend found! Candle 3 high: {candle3_high:.2f}")
-                    pool_results.append({
-                        'symbol': symbol,
-                        'candle1_date': trend['candle1_date'],
-                        'candle2_date': trend['candle2_date'],
-                        'candle3_date': trend['candle3_date'],
-                        'candle3_high': trend['candle3_high'],
-                        'detection_date': trend['detection_date']
-                    })
-            else:
-                print("No trend")
-        
-        except Exception as e:
-            print(f"Error: {e}")
-            continue
+    # Ensure output directory exists
+    os.makedirs(os.path.dirname(output_file) or ".", exist_ok=True)
     
-    # Create DataFrame
-    if pool_results:
-        pool_df = pd.DataFrame(pool_results)
-        
-        # Ensure output directory exists
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
-        
-        # Save to CSV
-        pool_df.to_csv(output_file, index=False)
-        print(f"\nPool creation completed. Found {len(pool_df)} stocks with trends.")
-        print(f"Results saved to {output_file}")
-        
-        return pool_df
+    try:
+        pool_df = _scan_stocks(detection_date)
+    except Exception:
+        # Never leave the previous run's pool in place after a failed run:
+        # finalization would read it as current. An empty pool yields no
+        # signals instead of stale ones.
+        logger.error("Pool creation failed; writing an empty pool to %s", output_file)
+        write_frame_atomic(pd.DataFrame(columns=list(_POOL_COLUMNS)), output_file)
+        raise
+    
+    # Save results (headers only if no trends were found)
+    write_frame_atomic(pool_df, output_file)
+    
+    if pool_df.empty:
+        logger.info("Pool creation completed. No stocks with trends found.")
     else:
-        print("\nPool creation completed. No stocks with trends found.")
-        # Create empty CSV with headers
-        empty_df = pd.DataFrame(columns=[
-            'symbol', 'candle1_date', 'candle2_date', 'candle3_date',
-            'candle3_high', 'detection_date'
-        ])
-        os.makedirs(os.path.dirname(output_file), exist_ok=True)
-        empty_df.to_csv(output_file, index=False)
-        return empty_df
+        logger.info("Pool creation completed. Found %d stocks with trends.", len(pool_df))
+        logger.info("Results saved to %s", output_file)
+    
+    return pool_df
 
 
 if __name__ == "__main__":
     # For testing
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     create_pool()
 
@@ -0,0 +1,84 @@
+"""Helpers for reading and writing job data files"""
+
+import os
+import tempfile
+from typing import Optional
+import pandas as pd
+
+# Parquet is read and written with pyarrow (see requirements.txt), never
+# silently with whichever other engine happens to be installed
+PARQUET_ENGINE = "pyarrow"
+
+
+def _is_parquet(path: str) -> bool:
+    """Check if a path refers to a Parquet file (by extension)."""
+    return path.endswith(".parquet")
+
+
+def write_frame_atomic(df: pd.DataFrame, path: str) -> None:
+    """
+    Write a DataFrame so readers never see a partially written file.
+    
+    Paths ending in .parquet are written as snappy-compressed Parquet, which
+    keeps column types (floats, datetimes) intact; any other path is written
+    as CSV. The data is written to a temporary file in the same directory
+    and then moved over `path` with os.replace, which is atomic on POSIX
+    and Windows. The destination directory must already exist.
+    
+    Args:
+        df: DataFrame to write
+        path: Destination file path
+    """
+    directory = os.path.dirname(path) or "."
+    suffix = os.path.splitext(path)[1]
+    
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            if _is_parquet(path):
+                df.to_parquet(f, engine=PARQUET_ENGINE, index=False, compression="snappy")
+            else:
+                df.to_csv(f, index=False)
+        # mkstemp creates the file as owner-only; use regular file permissions
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def find_data_file(path: str) -> Optional[str]:
+    """
+    Locate a data file, falling back to its legacy CSV version.
+    
+    Args:
+        path: Expected file path (e.g., "data/pool.parquet")
+    
+    Returns:
+        `path` if it exists, otherwise the same path with a .csv extension
+        if that exists, otherwise None
+    """
+    if os.path.exists(path):
+        return path
+    
+    csv_path = os.path.splitext(path)[0] + ".csv"
+    if os.path.exists(csv_path):
+        return csv_path
+    
+    return None
+
+
+def read_frame(path: str) -> pd.DataFrame:
+    """
+    Read a DataFrame written by write_frame_atomic.
+    
+    Args:
+        path: File path; .parquet files are read as Parquet (memory-mapped),
+            others as CSV
+    
+    Returns:
+        DataFrame with the file contents
+    """
+    if _is_parquet(path):
+        return pd.read_parquet(path, engine=PARQUET_ENGINE, memory_map=True)
+    return pd.read_csv(path)
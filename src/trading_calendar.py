@@ -0,0 +1,185 @@
+"""NSE trading calendar with a locally cached holiday table"""
+
+import logging
+import os
+import pickle
+from datetime import date, datetime, timedelta
+from importlib import metadata
+from typing import Optional
+
+from .tz import IST
+
+logger = logging.getLogger(__name__)
+
+# Local cache of the NSE holiday table, rebuilt when today falls outside it,
+# when it is older than CALENDAR_MAX_AGE_DAYS or when pandas_market_calendars
+# is upgraded (each release only ships holidays up to its own year)
+CALENDAR_CACHE_FILE = "data/nse_trading_days.pkl"
+
+# Number of years of holidays computed per cache rebuild
+CALENDAR_YEARS = 5
+
+# Maximum age of the cached table before it is rebuilt
+CALENDAR_MAX_AGE_DAYS = 365
+
+# Loaded once per process: {'start': date, 'end': date, 'coverage_end': date,
+# 'version': str, 'built': date, 'holidays': frozenset}
+_calendar: Optional[dict] = None
+
+# Set once the weekday-only fallback beyond the holiday data has been logged
+_coverage_warned = False
+
+
+def _installed_version() -> Optional[str]:
+    """Return the installed pandas_market_calendars version, or None"""
+    try:
+        return metadata.version('pandas_market_calendars')
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def _covers(calendar: dict, day: date) -> bool:
+    """
+    Check if a holiday table can answer for `day`.
+    
+    Days past the table's end are still covered once the table reaches the
+    last year pandas_market_calendars has holidays for, since rebuilding
+    would not add anything; is_trading_day falls back to weekdays there.
+    """
+    if day < calendar['start']:
+        return False
+    return day <= calendar['end'] or calendar['end'] >= calendar['coverage_end']
+
+
+def _is_stale(calendar: dict) -> bool:
+    """Check if a cached table predates the installed package or is too old"""
+    if calendar.get('version') != _installed_version():
+        return True
+    built = calendar.get('built')
+    if built is None:
+        return True
+    return datetime.now(IST).date() - built > timedelta(days=CALENDAR_MAX_AGE_DAYS)
+
+
+def _build_calendar(start: date) -> Optional[dict]:
+    """
+    Compute the NSE holiday table for CALENDAR_YEARS years from `start`.
+    
+    Holidays are the weekdays in the range that NSE does not trade on. The
+    range is capped at the end of the last year the installed
+    pandas_market_calendars release has holidays for.
+    
+    Args:
+        start: First date covered by the table
+    
+    Returns:
+        Calendar dictionary, or None if pandas_market_calendars is unavailable
+    """
+    try:
+        import pandas as pd
+        import pandas_market_calendars as mcal
+    except ImportError:
+        return None
+    
+    nse = mcal.get_calendar('NSE')
+    last_year = pd.Timestamp(max(nse.holidays().holidays)).year
+    coverage_end = date(last_year, 12, 31)
+    end = min(start + timedelta(days=365 * CALENDAR_YEARS), coverage_end)
+    
+    holidays = frozenset()
+    if start <= end:
+        valid_days = nse.valid_days(start_date=start, end_date=end)
+        trading_days = {d.date() for d in valid_days}
+        weekdays = {d.date() for d in pd.bdate_range(start, end)}
+        holidays = frozenset(weekdays - trading_days)
+    
+    return {
+        'start': start,
+        'end': end,
+        'coverage_end': coverage_end,
+        'version': mcal.__version__,
+        'built': datetime.now(IST).date(),
+        'holidays': holidays
+    }
+
+
+def _load_calendar(day: date) -> Optional[dict]:
+    """
+    Load the holiday table covering `day`, building and caching it if needed.
+    
+    Args:
+        day: Date that the table must cover
+    
+    Returns:
+        Calendar dictionary, or None if no holiday data is available
+    """
+    global _calendar
+    
+    if _calendar is not None and _covers(_calendar, day):
+        return _calendar
+    
+    if os.path.exists(CALENDAR_CACHE_FILE):
+        try:
+            with open(CALENDAR_CACHE_FILE, 'rb') as f:
+                cached = pickle.load(f)
+            if not _is_stale(cached) and _covers(cached, day):
+                _calendar = cached
+                return _calendar
+        except Exception as e:
+            logger.warning("Error reading trading calendar cache: %s", e)
+    
+    try:
+        calendar = _build_calendar(day)
+    except Exception as e:
+        logger.warning("Error building NSE trading calendar: %s", e)
+        return None
+    
+    if calendar is None:
+        return None
+    
+    try:
+        os.makedirs(os.path.dirname(CALENDAR_CACHE_FILE), exist_ok=True)
+        with open(CALENDAR_CACHE_FILE, 'wb') as f:
+            pickle.dump(calendar, f)
+    except Exception as e:
+        logger.warning("Error writing trading calendar cache: %s", e)
+    
+    _calendar = calendar
+    return _calendar
+
+
+def is_trading_day(day: Optional[date] = None) -> bool:
+    """
+    Check if a date is an NSE trading day (weekday, not a holiday).
+    
+    Holidays come from pandas_market_calendars and are cached locally in
+    CALENDAR_CACHE_FILE. If the package is not installed, or the date is
+    past the last year it has holidays for, only weekends are skipped.
+    
+    Args:
+        day: Date to check (default: today in IST)
+    
+    Returns:
+        True if NSE is open on that date, False otherwise
+    """
+    global _coverage_warned
+    
+    if day is None:
+        day = datetime.now(IST).date()
+    
+    # Check if it's a weekday (Monday=0, Sunday=6)
+    if day.weekday() >= 5:
+        return False
+    
+    calendar = _load_calendar(day)
+    if calendar is None:
+        return True
+    
+    if day > calendar['end']:
+        if not _coverage_warned:
+            logger.warning("No NSE holiday data after %s (pandas_market_calendars %s); "
+                           "only weekends are skipped", calendar['end'], calendar['version'])
+            _coverage_warned = True
+        return True
+    
+    return day not in calendar['holidays']
@@ -1,11 +1,19 @@
 """Trend detection module for 3-candle downward pattern"""
 
+import warnings
+import numpy as np
 import pandas as pd
-from typing import Optional
+from typing import Dict, Optional, Union
 from datetime import datetime
 
+from .heiken_ashi import HACandles, as_ha_candles
 
-def detect_trend(ha_df: pd.DataFrame) -> Optional[dict]:
+
+def detect_trend(
+    ha_df: Union[pd.DataFrame, HACandles],
+    detection_date: Optional[datetime] = None,
+    only_latest: bool = False
+) -> Optional[dict]:
     """
     Detect 3-candle downward trend pattern in reverse chronological order.
     
@@ -18,8 +26,14 @@ def detect_trend(ha_df: pd.DataFrame) -> Optional[dict]:
     In chronological order, this represents a downward trend with all red candles.
     
     Args:
-        ha_df: DataFrame with Heiken Ashi OHLC data, sorted oldest first
-               Must have columns: ['Open', 'High', 'Low', 'Close']
+        ha_df: HACandles, or DataFrame with Heiken Ashi OHLC data, sorted
+               oldest first. A DataFrame must have columns:
+               ['Open', 'High', 'Low', 'Close']
+        detection_date: Time reported as the detection date (default: now).
+                        Pass one value when checking many stocks in a run.
+        only_latest: If True, only check whether the 3 newest candles form
+                     the pattern (constant time) instead of searching the
+                     whole history for the newest match
     
     Returns:
         Dictionary with trend information if found:
@@ -37,112 +51,182 @@ def detect_trend(ha_df: pd.DataFrame) -> Optional[dict]:
         }
         Returns None if no trend is found
     """
-    if ha_df is None or len(ha_df) < 3:
+    candles = as_ha_candles(ha_df)
+    if candles is None or len(candles) < 3:
         return None
     
-    required_cols = ['Open', 'High', 'Low', 'Close']
-    if not all(col in ha_df.columns for col in required_cols):
+    # With only_latest, restrict the search to the single newest window
+    offset = len(candles) - 3 if only_latest else 0
+    
+    o = candles.open[offset:]
+    h = candles.high[offset:]
+    l = candles.low[offset:]
+    c = candles.close[offset:]
+    
+    # Windows are indexed by their oldest candle j (chronological order):
+    # Candle 3 = j, Candle 2 = j + 1, Candle 1 = j + 2 (newest)
+    red = o > c
+    
+    # All 3 candles RED, and the 4 trend conditions:
+    # 1. Candle 1 low < Candle 2 low
+    # 2. Candle 1 high < Candle 2 high
+    # 3. Candle 2 low < Candle 3 low
+    # 4. Candle 2 high < Candle 3 high
+    # The conditions are ANDed into one mask in place, reusing a single
+    # buffer for the comparisons instead of allocating a temporary each
+    mask = red[:-2] & red[1:-1]
+    mask &= red[2:]
+    
+    # Most windows fail the cheap all-red test; skip the high/low
+    # comparisons entirely when none passes
+    if not mask.any():
         return None
     
-    # Reverse the dataframe to work in reverse chronological order (newest first)
-    # We'll iterate from newest to oldest
-    reversed_df = ha_df.iloc[::-1].reset_index()
+    cond = np.empty_like(mask)
+    for newer, older in ((l[2:], l[1:-1]), (h[2:], h[1:-1]),
+                         (l[1:-1], l[:-2]), (h[1:-1], h[:-2])):
+        np.less(newer, older, out=cond)
+        mask &= cond
     
-    # Look for 3 consecutive candles matching the pattern
-    for i in range(len(reversed_df) - 2):
-        # Get the 3 candles in reverse chronological order (newest first)
-        candle1 = reversed_df.iloc[i]      # Newest
-        candle2 = reversed_df.iloc[i + 1]  # Middle
-        candle3 = reversed_df.iloc[i + 2]  # Oldest
-        
-        # Extract values
-        c1_open = candle1['Open']
-        c1_close = candle1['Close']
-        c1_low = candle1['Low']
-        c1_high = candle1['High']
-        
-        c2_open = candle2['Open']
-        c2_close = candle2['Close']
-        c2_low = candle2['Low']
-        c2_high = candle2['High']
-        
-        c3_open = candle3['Open']
-        c3_close = candle3['Close']
-        c3_low = candle3['Low']
-        c3_high = candle3['High']
-        
-        # Check that all 3 candles are RED (bearish): Open > Close
-        all_red = (c1_open > c1_close and 
-                   c2_open > c2_close and 
-                   c3_open > c3_close)
-        
-        if not all_red:
-            continue  # Skip if not all candles are red
+    matches = np.flatnonzero(mask)
+    if len(matches) == 0:
+        return None
+    
+    # Use the newest matching pattern
+    j = matches[-1]
+    idx3, idx2, idx1 = j, j + 1, j + 2
+    
+    return {
+        'candle1_date': candles.dates[offset + idx1],
+        'candle2_date': candles.dates[offset + idx2],
+        'candle3_date': candles.dates[offset + idx3],
+        'candle1_high': float(h[idx1]),
+        'candle2_high': float(h[idx2]),
+        'candle3_high': float(h[idx3]),
+        'candle1_low': float(l[idx1]),
+        'candle2_low': float(l[idx2]),
+        'candle3_low': float(l[idx3]),
+        'detection_date': detection_date if detection_date is not None else datetime.now()
+    }
+
+
+def detect_trends_batch(
+    candles_by_symbol: Dict[str, Union[pd.DataFrame, HACandles]],
+    detection_date: Optional[datetime] = None
+) -> Dict[str, dict]:
+    """
+    Detect the 3-candle downward trend pattern in many stocks at once.
+    
+    Same pattern and result as detect_trend, but all stocks are checked
+    with one set of array operations: each OHLC column is stacked into a
+    (stocks, candles) array, right-aligned on the newest candle and padded
+    with NaN at the start for stocks with shorter history. Comparisons
+    with NaN are False, so padding never forms a pattern.
+    
+    Args:
+        candles_by_symbol: Dictionary mapping symbol to its Heiken Ashi
+                           candles (HACandles or DataFrame), sorted oldest first
+        detection_date: Time reported as the detection date (default: now)
+    
+    Returns:
+        Dictionary mapping symbol to trend information (as returned by
+        detect_trend, plus 'symbol') for every stock with a trend
+    """
+    if detection_date is None:
+        detection_date = datetime.now()
+    
+    stocks = []
+    for symbol, ha in candles_by_symbol.items():
+        candles = as_ha_candles(ha)
+        if candles is not None and len(candles) >= 3:
+            stocks.append((symbol, candles))
+    
+    if not stocks:
+        return {}
+    
+    # One (stocks, candles) slab per column, so each is contiguous
+    n = max(len(candles) for _, candles in stocks)
+    ohlc = np.full((4, len(stocks), n), np.nan)
+    for k, (_, candles) in enumerate(stocks):
+        pad = n - len(candles)
+        ohlc[0, k, pad:] = candles.open
+        ohlc[1, k, pad:] = candles.high
+        ohlc[2, k, pad:] = candles.low
+        ohlc[3, k, pad:] = candles.close
+    o, h, l, c = ohlc
+    
+    # Windows are indexed by their oldest candle j along axis 1, as in
+    # detect_trend: Candle 3 = j, Candle 2 = j + 1, Candle 1 = j + 2
+    red = o > c
+    mask = red[:, :-2] & red[:, 1:-1]
+    mask &= red[:, 2:]
+    
+    if not mask.any():
+        return {}
+    
+    cond = np.empty_like(mask)
+    for newer, older in ((l[:, 2:], l[:, 1:-1]), (h[:, 2:], h[:, 1:-1]),
+                         (l[:, 1:-1], l[:, :-2]), (h[:, 1:-1], h[:, :-2])):
+        np.less(newer, older, out=cond)
+        mask &= cond
+    
+    # Newest matching window of each stock: last True in its row
+    has_trend = mask.any(axis=1)
+    newest = mask.shape[1] - 1 - np.argmax(mask[:, ::-1], axis=1)
+    
+    trends = {}
+    for k in np.flatnonzero(has_trend):
+        symbol, candles = stocks[k]
+        j = newest[k]
         
-        # Check all 4 trend conditions:
-        # 1. Candle 1 low < Candle 2 low
-        # 2. Candle 1 high < Candle 2 high
-        # 3. Candle 2 low < Candle 3 low
-        # 4. Candle 2 high < Candle 3 high
+        # Map padded positions back to positions in this stock's candles
+        pad = n - len(candles)
+        idx3, idx2, idx1 = j - pad, j + 1 - pad, j + 2 - pad
         
-        if (c1_low < c2_low and
-            c1_high < c2_high and
-            c2_low < c3_low and
-            c2_high < c3_high):
-            
-            # Pattern found!
-            # Get dates from the original index (before reversal)
-            # Since we reversed, we need to map back to original indices
-            orig_idx1 = len(ha_df) - 1 - i      # Newest candle (Candle 1)
-            orig_idx2 = len(ha_df) - 2 - i      # Middle candle (Candle 2)
-            orig_idx3 = len(ha_df) - 3 - i      # Oldest candle (Candle 3)
-            
-            # Extract dates from original DataFrame index
-            if isinstance(ha_df.index[0], datetime):
-                candle1_date = ha_df.index[orig_idx1]
-                candle2_date = ha_df.index[orig_idx2]
-                candle3_date = ha_df.index[orig_idx3]
-            elif 'Date' in reversed_df.columns:
-                candle1_date = candle1['Date']
-                candle2_date = candle2['Date']
-                candle3_date = candle3['Date']
-            else:
-                # Fallback: use index values as dates
-                candle1_date = ha_df.index[orig_idx1]
-                candle2_date = ha_df.index[orig_idx2]
-                candle3_date = ha_df.index[orig_idx3]
-            
-            return {
-                'candle1_date': candle1_date,
-                'candle2_date': candle2_date,
-                'candle3_date': candle3_date,
-                'candle1_high': float(c1_high),
-                'candle2_high': float(c2_high),
-                'candle3_high': float(c3_high),
-                'candle1_low': float(c1_low),
-                'candle2_low': float(c2_low),
-                'candle3_low': float(c3_low),
-                'detection_date': datetime.now()
-            }
+        trends[symbol] = {
+            'candle1_date': candles.dates[idx1],
+            'candle2_date': candles.dates[idx2],
+            'candle3_date': candles.dates[idx3],
+            'candle1_high': float(h[k, j + 2]),
+            'candle2_high': float(h[k, j + 1]),
+            'candle3_high': float(h[k, j]),
+            'candle1_low': float(l[k, j + 2]),
+            'candle2_low': float(l[k, j + 1]),
+            'candle3_low': float(l[k, j]),
+            'detection_date': detection_date,
+            'symbol': symbol
+        }
     
-    return None
+    return trends
 
 
 def find_trends_in_stock(
     symbol: str,
-    ha_df: pd.DataFrame
+    ha_df: Union[pd.DataFrame, HACandles],
+    detection_date: Optional[datetime] = None
 ) -> Optional[dict]:
     """
     Find trend pattern in a stock's Heiken Ashi data.
     
+    Deprecated: the pool creation job no longer uses this wrapper; call
+    detect_trend (or detect_trends_batch for many stocks) and set
+    trend['symbol'] directly.
+    
     Args:
         symbol: Stock symbol
-        ha_df: Heiken Ashi DataFrame
+        ha_df: Heiken Ashi candles (HACandles or DataFrame)
+        detection_date: Time reported as the detection date (default: now)
     
     Returns:
         Dictionary with trend info including symbol, or None if not found
     """
-    trend = detect_trend(ha_df)
+    warnings.warn(
+        "find_trends_in_stock is deprecated; use detect_trend or detect_trends_batch",
+        DeprecationWarning,
+        stacklevel=2
+    )
+    
+    trend = detect_trend(ha_df, detection_date)
     if trend:
         trend['symbol'] = symbol
         return trend
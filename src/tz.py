@@ -0,0 +1,6 @@
+"""Shared timezone constants"""
+
+from zoneinfo import ZoneInfo
+
+# Indian Standard Time, the timezone NSE trades in
+IST = ZoneInfo('Asia/Kolkata')